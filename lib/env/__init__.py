@@ -51,7 +51,17 @@ Hierzu gehören
 
 """
 
+import bisect
 import logging
+import math
+import sys
+import threading
+
+# orjson is optional, it parses the nominatim responses faster and with fewer allocations than json
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
 
 from lib.translation import translate
 
@@ -61,6 +71,37 @@ _logger = logging.getLogger('lib.env')
 _mile = 1609.344       # 1 mile is 1609.344 meters long
 _nautical_mile = 1852  # 1 nm is 1852 meters long
 
+# conversion factors to km/h (folded at import time)
+_MS_TO_KMH = 3.6                       # 1 m/s = 3.6 km/h
+_KN_TO_KMH = _nautical_mile / 1000     # 1 kn = 1.852 km/h
+_MPS_TO_KMH = 3.6 * _mile              # 1 mps = 5793.6384 km/h
+_MPH_TO_KMH = _mile / 1000             # 1 mph = 1.609344 km/h
+
+# Upper limits (in m/s) of the Beaufort scale values 0 to 11, everything above is bft 12
+# Origin of table: https://www.smarthomeng.de/vom-winde-verweht
+_BFT_THRESHOLDS = (0.3, 1.6, 3.4, 5.5, 8.0, 10.8, 13.9, 17.2, 20.8, 24.5, 28.5, 32.7)
+_BFT_THRESHOLDS_KMH = tuple(t * _MS_TO_KMH for t in _BFT_THRESHOLDS)
+
+# translation keys (bin/locale.yaml) of the descriptions for bft 0 to 12
+_BFT_TEXT_KEYS = tuple('bft_' + str(bft) for bft in range(13))
+
+
+def _is_numeric_ndarray(value) -> bool:
+    """
+    Prüft, ob ein Parameter ein numpy Array mit numerischen Werten ist
+
+    Arrays mit anderen Datentypen (z.B. Strings oder Objekte) werden von den vektorisierten Funktionen
+    nicht unterstützt und wie andere ungültige Parameter behandelt.
+
+    Ein numpy Array kann nur übergeben werden, wenn der Aufrufer numpy bereits importiert hat,
+    deshalb wird numpy hierfür nicht importiert.
+
+    :param value: zu prüfender Parameter
+    :return: True, wenn der Parameter ein numerisches numpy Array ist
+    """
+    np = sys.modules.get('numpy')
+    return np is not None and isinstance(value, np.ndarray) and np.issubdtype(value.dtype, np.number)
+
 
 """
 Umrechnungen von Geschwindigkeiten  (m/s, km/h, mph, Knoten, mps, Bft)
@@ -77,9 +118,9 @@ def kn_to_kmh(speed: float) -> float:
     """
     if not isinstance(speed,(int, float)):
         _logger.error("kn_to_kmh: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(speed)}))
-        return -1
+        return math.nan
 
-    return speed * _nautical_mile
+    return speed * _KN_TO_KMH
 
 
 def kmh_to_kn(speed: float) -> float:
@@ -91,9 +132,9 @@ def kmh_to_kn(speed: float) -> float:
     """
     if not isinstance(speed,(int, float)):
         _logger.error("kmh_to_kn: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(speed)}))
-        return -1
+        return math.nan
 
-    return speed / _nautical_mile
+    return speed / _KN_TO_KMH
 
 
 def ms_to_kmh(speed: float) -> float:
@@ -105,9 +146,9 @@ def ms_to_kmh(speed: float) -> float:
     """
     if not isinstance(speed,(int, float)):
         _logger.error("ms_to_kmh: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(speed)}))
-        return -1
+        return math.nan
 
-    return speed * 3.6
+    return speed * _MS_TO_KMH
 
 
 def kmh_to_ms(speed: float) -> float:
@@ -119,9 +160,9 @@ def kmh_to_ms(speed: float) -> float:
     """
     if not isinstance(speed,(int, float)):
         _logger.error("kmh_to_ms: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(speed)}))
-        return -1
+        return math.nan
 
-    return speed / 3.6
+    return speed / _MS_TO_KMH
 
 
 def mps_to_kmh(speed: float) -> float:
@@ -133,9 +174,9 @@ def mps_to_kmh(speed: float) -> float:
     """
     if not isinstance(speed,(int, float)):
         _logger.error("mps_to_kmh: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(speed)}))
-        return -1
+        return math.nan
 
-    return speed * 3.6 * _mile
+    return speed * _MPS_TO_KMH
 
 
 def kmh_to_mps(speed: float) -> float:
@@ -147,9 +188,9 @@ def kmh_to_mps(speed: float) -> float:
     """
     if not isinstance(speed,(int, float)):
         _logger.error("kmh_to_mps: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(speed)}))
-        return -1
+        return math.nan
 
-    return speed / 3.6 / _mile
+    return speed / _MPS_TO_KMH
 
 
 def mph_to_kmh(speed: float) -> float:
@@ -161,9 +202,9 @@ def mph_to_kmh(speed: float) -> float:
     """
     if not isinstance(speed,(int, float)):
         _logger.error("mph_to_kmh: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(speed)}))
-        return -1
+        return math.nan
 
-    return speed * _mile / 1000
+    return speed * _MPH_TO_KMH
 
 
 def kmh_to_mph(speed: float) -> float:
@@ -175,9 +216,9 @@ def kmh_to_mph(speed: float) -> float:
     """
     if not isinstance(speed,(int, float)):
         _logger.error("kmh_to_mph: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(speed)}))
-        return -1
+        return math.nan
 
-    return speed / _mile * 1000
+    return speed / _MPH_TO_KMH
 
 
 def ms_to_bft(speed: float) -> int:
@@ -190,25 +231,42 @@ def ms_to_bft(speed: float) -> int:
     :return: Windgeschwindigkeit in bft
     """
     if not isinstance(speed,(int, float)):
+        if _is_numeric_ndarray(speed):
+            return ms_to_bft_array(speed)
         _logger.error("ms_to_bft: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(speed)}))
         return -1
 
-    # Origin of table: https://www.smarthomeng.de/vom-winde-verweht
-    table = [
-        (0.3, 0),
-        (1.6, 1),
-        (3.4, 2),
-        (5.5, 3),
-        (8.0, 4),
-        (10.8, 5),
-        (13.9, 6),
-        (17.2, 7),
-        (20.8, 8),
-        (24.5, 9),
-        (28.5, 10),
-        (32.7, 11),
-        (999, 12)]
-    return min(filter(lambda x: x[0] >= speed, table))[1]
+    if math.isnan(speed):
+        return -1
+    return bisect.bisect_left(_BFT_THRESHOLDS, speed)
+
+
+def ms_to_bft_array(speeds):
+    """
+    Umrechnung einer Reihe von Windgeschwindigkeiten von Meter pro Sekunde in Beaufort
+
+    Die Umrechnung erfolgt vektorisiert und benötigt das Python Package numpy
+
+    :param speeds: numpy Array mit Windgeschwindigkeiten in m/s
+    :return: numpy Array (int8) mit Windgeschwindigkeiten in bft (-1 für fehlende Werte / NaN)
+    """
+    return _bft_array(speeds, _BFT_THRESHOLDS)
+
+
+def _bft_array(speeds, thresholds: tuple):
+    """
+    Vektorisierte Beaufort Umrechnung für ms_to_bft_array und kmh_to_bft_array
+
+    :param speeds: numpy Array mit Windgeschwindigkeiten
+    :param thresholds: Beaufort Schwellwerte in der Einheit der Windgeschwindigkeiten
+    :return: numpy Array (int8) mit Windgeschwindigkeiten in bft (-1 für fehlende Werte / NaN)
+    """
+    import numpy as np
+
+    speeds = np.asarray(speeds, dtype=np.float64)
+    bft = np.searchsorted(thresholds, speeds, side='left')
+    # searchsorted sorts NaN behind all thresholds, which would result in bft 12
+    return np.where(np.isnan(speeds), -1, bft).astype(np.int8)
 
 
 def kmh_to_bft(speed: float) -> int:
@@ -221,10 +279,26 @@ def kmh_to_bft(speed: float) -> int:
     :return: Windgeschwindigkeit in bft
     """
     if not isinstance(speed,(int, float)):
+        if _is_numeric_ndarray(speed):
+            return kmh_to_bft_array(speed)
         _logger.error("kmh_to_bft: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(speed)}))
         return -1
 
-    return ms_to_bft(kmh_to_ms(speed))
+    if math.isnan(speed):
+        return -1
+    return bisect.bisect_left(_BFT_THRESHOLDS_KMH, speed)
+
+
+def kmh_to_bft_array(speeds):
+    """
+    Umrechnung einer Reihe von Windgeschwindigkeiten von Kilometer pro Stunde in Beaufort
+
+    Die Umrechnung erfolgt vektorisiert und benötigt das Python Package numpy
+
+    :param speeds: numpy Array mit Windgeschwindigkeiten in km/h
+    :return: numpy Array (int8) mit Windgeschwindigkeiten in bft (-1 für fehlende Werte / NaN)
+    """
+    return _bft_array(speeds, _BFT_THRESHOLDS_KMH)
 
 
 def bft_to_text(bft: int, language: str='de') -> str:
@@ -235,16 +309,18 @@ def bft_to_text(bft: int, language: str='de') -> str:
     :return: Text Beschreibung der Windgeschwindigkeit
     """
 
-    if not isinstance(bft,(int, float)):
+    # the range check rejects non-numeric parameters with a TypeError (ValueError for numpy arrays)
+    try:
+        key = _BFT_TEXT_KEYS[int(bft)] if -1 < bft < 13 else None
+    except (TypeError, ValueError):
         _logger.error("bft_to_text: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(bft)}))
         return ''
 
-    bft = int(bft)
-    if (bft < 0) or (bft > 12):
+    if key is None:
         _logger.error("bft_to_text: " + translate("Beaufort is out of scale: '{bft}'", {'bft': bft}))
         return ''
 
-    return translate("bft_"+str(bft))
+    return translate(key)
 
 
 """
@@ -262,7 +338,7 @@ def miles_to_meter(distance):
         _logger.error("miles_to_meter: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(distance)}))
         return -1
 
-    return miles * _mile
+    return distance * _mile
 
 
 def nauticalmiles_to_meter(distance):
@@ -276,7 +352,7 @@ def nauticalmiles_to_meter(distance):
         _logger.error("nauticalmiles_to_meter: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(distance)}))
         return -1
 
-    return miles * _nautical_mile
+    return distance * _nautical_mile
 
 
 def meter_to_miles(distance):
@@ -290,7 +366,7 @@ def meter_to_miles(distance):
         _logger.error("meter_to_miles: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(distance)}))
         return -1
 
-    return meter / _mile
+    return distance / _mile
 
 
 def meter_to_nauticalmiles(distance):
@@ -304,7 +380,7 @@ def meter_to_nauticalmiles(distance):
         _logger.error("meter_to_nauticalmiles: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(distance)}))
         return -1
 
-    return meter / _nautical_mile
+    return distance / _nautical_mile
 
 
 """
@@ -343,6 +419,11 @@ def c_to_f(grad: float) -> float:
 Die folgenden Funktionen dienen der Umrechnung einer Himmelsrichtung von Grad in die gebräuchlichen Abkürzungen
 """
 
+# the last entry ('N') covers degrees just below 360°
+_DIRECTIONS_8 = ('N', 'NO', 'O', 'SO', 'S', 'SW', 'W', 'NW', 'N')
+_DIRECTIONS_16 = ('N', 'NNO', 'NO', 'ONO', 'O', 'OSO', 'SO', 'SSO', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW', 'N')
+
+
 def degrees_to_direction_8(deg: float) -> str:
     """
     Umrechnung Gradzahl in Himmelsrichtung (Abkürzung)
@@ -356,13 +437,16 @@ def degrees_to_direction_8(deg: float) -> str:
         return '?'
 
     if not isinstance(deg,(int, float)):
+        if _is_numeric_ndarray(deg):
+            return degrees_to_direction_8_array(deg)
         _logger.error("degrees_to_direction_8: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(deg)}))
         return ''
 
-    direction_array = ['N', 'NO', 'O', 'SO', 'S', 'SW', 'W', 'NW', 'N']
+    if not math.isfinite(deg):
+        return '?'
 
     index = int( (deg % 360 + 22.5) / 45)
-    return direction_array[index]
+    return _DIRECTIONS_8[index]
 
 
 def degrees_to_direction_16(deg: float) -> str:
@@ -378,66 +462,187 @@ def degrees_to_direction_16(deg: float) -> str:
         return '?'
 
     if not isinstance(deg,(int, float)):
+        if _is_numeric_ndarray(deg):
+            return degrees_to_direction_16_array(deg)
         _logger.error("degrees_to_direction_16: " + translate("Parameter must be of type float or int but is of type {typ}", {'typ': type(deg)}))
         return ''
 
-    direction_array = ['N', 'NNO', 'NO', 'ONO', 'O', 'OSO', 'SO', 'SSO', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW', 'N']
+    if not math.isfinite(deg):
+        return '?'
 
     index = int( (deg % 360 + 11.25) / 22.5)
-    return direction_array[index]
+    return _DIRECTIONS_16[index]
+
+
+def degrees_to_direction_8_array(degs):
+    """
+    Umrechnung einer Reihe von Gradzahlen in Himmelsrichtungen (Abkürzung)
+
+    Diese Funktion teilt die Himmelsrichtungen in 8 Sektoren.
+    Die Umrechnung erfolgt vektorisiert und benötigt das Python Package numpy
+
+    :param degs: numpy Array mit Kompass Gradzahlen
+    :return: numpy Array mit Himmelsrichtungen (Abkürzung), '?' für fehlende Werte (NaN)
+    """
+    return _directions_array(degs, _DIRECTIONS_8)
+
+
+def degrees_to_direction_16_array(degs):
+    """
+    Umrechnung einer Reihe von Gradzahlen in Himmelsrichtungen (Abkürzung)
+
+    Diese Funktion teilt die Himmelsrichtungen in 16 Sektoren.
+    Die Umrechnung erfolgt vektorisiert und benötigt das Python Package numpy
+
+    :param degs: numpy Array mit Kompass Gradzahlen
+    :return: numpy Array mit Himmelsrichtungen (Abkürzung), '?' für fehlende Werte (NaN)
+    """
+    return _directions_array(degs, _DIRECTIONS_16)
+
+
+def _directions_array(degs, directions: tuple):
+    """
+    Vektorisierte Umrechnung für degrees_to_direction_8_array und degrees_to_direction_16_array
+
+    :param degs: numpy Array mit Kompass Gradzahlen
+    :param directions: Himmelsrichtungen der Sektoren (der letzte Eintrag wiederholt 'N')
+    :return: numpy Array mit Himmelsrichtungen (Abkürzung), '?' für fehlende Werte (NaN)
+    """
+    import numpy as np
+
+    degs = np.asarray(degs, dtype=np.float64)
+    valid = np.isfinite(degs)
+    sector = 360 / (len(directions) - 1)
+    # invalid entries are replaced before the cast, casting NaN to int is undefined
+    indices = ((np.where(valid, degs, 0) % 360 + sector / 2) // sector).astype(np.int8)
+    return np.where(valid, np.take(directions, indices), '?')
 
 
 from typing import Union
 
-# Ab Python 3.10 auch: def location_name(lat: float | str, lon: float | str) -> str:
-def location_name(lat: Union[float, str], lon: Union[float, str]) -> str:
+_LOCATION_CACHE_SIZE = 128  # max. number of cached nominatim responses
+_location_cache = {}
+_session = None
+# eval statements and logics run in worker threads: guards the cache updates and the session creation
+_location_lock = threading.Lock()
+
+
+def _get_session():
     """
-    Lokationsname (Stadt, Stadtteil oder Ort) einer Lokation, die über Latitude und Longitude gewählt wird.
-    Die Informationen werden von OpenWeatherMap abgerufen.
+    requests Session für Abfragen bei nominatim.openstreetmap.org
+
+    Die Session wird beim ersten Aufruf angelegt, damit TCP/TLS Verbindungen wiederverwendet werden.
+    Bei Verbindungsfehlern und temporären Server Fehlern (502, 503, 504) wird der Request bis zu drei mal
+    wiederholt.
+
+    :return: requests Session
+    """
+    global _session
+
+    with _location_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            session = requests.Session()
+            retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=retry))
+            # the nominatim usage policy requires an identifying user agent
+            session.headers['User-Agent'] = 'SmartHomeNG/lib.env'
+            _session = session
+    return _session
+
+
+def _reverse_geocode(lat: Union[float, str], lon: Union[float, str], caller: str) -> dict:
+    """
+    Reverse Geocoding einer Lokation über nominatim.openstreetmap.org
+
+    Erfolgreiche Antworten (Status 200 mit Address-Information) werden je (auf 4 Nachkommastellen
+    gerundeter) Latitude und Longitude zwischengespeichert, da sich die Lokation einer SmartHomeNG
+    Installation praktisch nie ändert und Nominatim max. einen Request pro Sekunde erlaubt.
+    Fehler werden nicht zwischengespeichert, der nächste Aufruf fragt erneut an.
 
     :param lat: Latitude
     :param lon: Longitude
-    :return: Lokationsname
+    :param caller: Name der aufrufenden Funktion (für Log Einträge)
+    :return: json Antwort als dict (enthält immer 'address') oder None im Fehlerfall
     """
-
-    import requests
+    try:
+        cache_key = (round(float(lat), 4), round(float(lon), 4))
+    except (TypeError, ValueError):
+        cache_key = None
+    else:
+        json_obj = _location_cache.get(cache_key)
+        if json_obj is not None:
+            return json_obj
 
     # api documentation: https://nominatim.org/release-docs/develop/api/Reverse/
     request_str = f"https://nominatim.openstreetmap.org/reverse?lat={lat}&lon={lon}&format=jsonv2"
 
     try:
-        response = requests.get(request_str)
+        response = _get_session().get(request_str, timeout=5)
     except Exception as e:
-        _logger.warning("location_name: " + translate("Exception when sending GET request: {e}", {'e': e}))
-        return ''
+        _logger.warning(f"{caller}: " + translate("Exception when sending GET request: {e}", {'e': e}))
+        return None
+
+    if response.status_code >= 500:
+        _logger.warning(f"{caller}: " + translate("Server error {status_code} from nominatim.openstreetmap.org", {'status_code': response.status_code}))
+        return None
+
+    if response.status_code != 200:
+        _logger.warning(f"{caller}: " + translate("Unexpected HTTP status {status_code} from nominatim.openstreetmap.org", {'status_code': response.status_code}))
+        return None
 
     try:
-        json_obj = response.json()
+        json_obj = _json_loads(response.content)
     except Exception as e:
-        _logger.warning("location_name: " + translate("Response '{response}' is not in valid json format: {e}", {'response': response, 'e': e}))
-        return ''
+        _logger.warning(f"{caller}: " + translate("Response '{response}' is not in valid json format: {e}", {'response': response, 'e': e}))
+        return None
 
-    if response.status_code >= 500:
-        _logger.warning(f"location_name: {location_name(response.status_code)}")
+    # nominatim reports errors like 'Unable to geocode' with status 200 and without address
+    if not isinstance(json_obj, dict) or not isinstance(json_obj.get('address'), dict):
+        _logger.warning(f"{caller}: " + translate("No address information in response '{response}' for lat={lat}, lon={lon}", {'response': json_obj, 'lat': lat, 'lon': lon}))
+        return None
+
+    if cache_key is not None:
+        with _location_lock:
+            if cache_key not in _location_cache and len(_location_cache) >= _LOCATION_CACHE_SIZE:
+                # evict the oldest entry
+                del _location_cache[next(iter(_location_cache))]
+            _location_cache[cache_key] = json_obj
+    return json_obj
+
+
+# Ab Python 3.10 auch: def location_name(lat: float | str, lon: float | str) -> str:
+def location_name(lat: Union[float, str], lon: Union[float, str]) -> str:
+    """
+    Lokationsname (Stadt, Stadtteil oder Ort) einer Lokation, die über Latitude und Longitude gewählt wird.
+    Die Informationen werden von OpenWeatherMap abgerufen.
+
+    :param lat: Latitude
+    :param lon: Longitude
+    :return: Lokationsname
+    """
+
+    json_obj = _reverse_geocode(lat, lon, 'location_name')
+    if json_obj is None:
         return ''
 
-    if json_obj.get('address', None) is None:
-        result = ''
-        _logger.notice(f"No 'address' in json response '{json_obj}' for request '{request_str}'")
+    address = json_obj['address']
+    if address.get('city', None) is not None:
+        result = address['city']
+    elif address.get('town', None) is not None:
+        result = address['town']
+    elif address.get('village', None) is not None:
+        result = address['village']
     else:
-        if json_obj['address'].get('city', None) is not None:
-            result = json_obj['address']['city']
-        elif json_obj['address'].get('town', None) is not None:
-            result = json_obj['address']['town']
-        elif json_obj['address'].get('village', None) is not None:
-            result = json_obj['address']['village']
-        else:
-            result = ''
-
-    if  json_obj['address'].get('suburb', None) is not None:
+        result = ''
+
+    if address.get('suburb', None) is not None:
         if result != '':
             result += ', '
-        result += json_obj['address']['suburb']
+        result += address['suburb']
 
     return result
 
@@ -452,29 +657,11 @@ def location_address(lat: Union[float, str], lon: Union[float, str]) -> dict:
     :return: Address Information
     """
 
-    import requests
-
-    # api documentation: https://nominatim.org/release-docs/develop/api/Reverse/
-    request_str = f"https://nominatim.openstreetmap.org/reverse?lat={lat}&lon={lon}&format=jsonv2"
-
-    try:
-        response = requests.get(request_str)
-    except Exception as e:
-        _logger.warning("location_name: " + translate("Exception when sending GET request: {e}", {'e': e}))
-        return ''
-
-    try:
-        json_obj = response.json()
-    except Exception as e:
-        _logger.warning("location_name: " + translate("Response '{response}' is not in valid json format: {e}", {'response': response, 'e': e}))
-        return ''
-
-    if response.status_code >= 500:
-        _logger.warning(f"location_name: {location_name(response.status_code)}")
+    json_obj = _reverse_geocode(lat, lon, 'location_address')
+    if json_obj is None:
         return ''
 
     #self._logger.notice(f"{json_obj['display_name']}")
 
-    return json_obj['address']
-
-
+    # return a copy, so callers can not modify the cached response
+    return dict(json_obj['address'])
@@ -25,6 +25,7 @@ This library imports modules with user-functions to be used in eval statements a
 
 import os
 import logging
+import importlib
 
 from lib.translation import translate
 
@@ -48,26 +49,21 @@ def import_user_module(m):
     """
     modulename = _uf_subdir + '.' + m
 
-    import importlib
     try:
-        exec(f"globals()['{m}']=importlib.import_module('{modulename}')")
+        module = importlib.import_module(modulename)
     except Exception as e:
         _logger.error(translate("Error importing userfunctions from '{module}': {error}", {'module': m, 'error': e}))
         return False
     else:
-        global _uf_version
-        _uf_version = '?.?.?'
-        try:
-            exec( f"globals()['_uf_version'] = {m}._VERSION" )
-        except:
-            exec( f"{m}._VERSION = _uf_version" )
+        globals()[m] = module
 
-        global _uf_description
-        _uf_description = '?'
-        try:
-            exec( f"globals()['_uf_description'] = {m}._DESCRIPTION" )
-        except:
-            exec( f"{m}._DESCRIPTION = _uf_description" )
+        if not hasattr(module, '_VERSION'):
+            module._VERSION = '?.?.?'
+        _uf_version = module._VERSION
+
+        if not hasattr(module, '_DESCRIPTION'):
+            module._DESCRIPTION = '?'
+        _uf_description = module._DESCRIPTION
 
         _logger.notice(translate("Imported userfunctions from '{module}' v{version} - {description}", {'module': m, 'version':_uf_version, 'description': _uf_description}))
 
@@ -93,14 +89,11 @@ def init_lib(shng_base_dir=None, sh=None):
 
     _func_dir = os.path.join(base_dir, _uf_subdir)
 
-    user_modules = []
     if os.path.isdir(_func_dir):
-        wrk = os.listdir(_func_dir)
-        for f in wrk:
-            if f.endswith('.py'):
-                user_modules.append(f.split(".")[0])
-
-    _user_modules = sorted(user_modules)
+        with os.scandir(_func_dir) as entries:
+            _user_modules = sorted(e.name[:-3] for e in entries if e.name.endswith('.py') and e.is_file())
+    else:
+        _user_modules = []
 
     # Import all modules with userfunctions from <shng_base_dir>/functions
     for m in _user_modules:
@@ -115,22 +108,20 @@ def get_uf_dir():
 
 def reload(userlib):
 
-    import importlib
-
     if userlib in _user_modules:
-        try:
-            exec( f"importlib.reload({userlib})")
-        except Exception as e:
-            if str(e) == f"name '{userlib}' is not defined":
-                _logger.warning(translate("Error reloading userfunctions Modul '{module}': Module is not loaded, trying to newly import userfunctions '{module}' instead", {'module': userlib}))
-                if import_user_module(userlib):
-                    return True
-                else:
-                    return False
+        module = globals().get(userlib)
+        if module is None:
+            _logger.warning(translate("Error reloading userfunctions Modul '{module}': Module is not loaded, trying to newly import userfunctions '{module}' instead", {'module': userlib}))
+            if import_user_module(userlib):
+                return True
             else:
-                _logger.error(translate("Error reloading userfunctions '{module}': {error} - old version of '{module}' is still active", {'module': userlib, 'error': e}))
                 return False
 
+        try:
+            importlib.reload(module)
+        except Exception as e:
+            _logger.error(translate("Error reloading userfunctions '{module}': {error} - old version of '{module}' is still active", {'module': userlib, 'error': e}))
+            return False
         else:
             _logger.notice(translate("Reloaded userfunctions '{module}'", {'module': userlib}))
             return True
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# vim: set encoding=utf-8 tabstop=4 softtabstop=4 shiftwidth=4 expandtab
+#########################################################################
+#  This file is part of SmartHomeNG
+#  https://github.com/smarthomeNG/smarthome
+#  http://knx-user-forum.de/
+#
+#  SmartHomeNG is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SmartHomeNG is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SmartHomeNG If not, see <http://www.gnu.org/licenses/>.
+#########################################################################
+from . import common
+import json
+import math
+import threading
+import unittest
+
+import lib.env as env
+import lib.translation
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# upper limits (in m/s) of bft 0 to 11
+BFT_LIMITS = (0.3, 1.6, 3.4, 5.5, 8.0, 10.8, 13.9, 17.2, 20.8, 24.5, 28.5, 32.7)
+
+
+class LibEnvTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        lib.translation.initialize_translations(common.BASE, 'de', 'en')
+
+    def test_knots(self):
+        self.assertAlmostEqual(env.kn_to_kmh(10), 18.52)
+        self.assertAlmostEqual(env.kmh_to_kn(18.52), 10)
+        self.assertAlmostEqual(env.kmh_to_kn(env.kn_to_kmh(7.5)), 7.5)
+
+    def test_speed(self):
+        self.assertAlmostEqual(env.ms_to_kmh(10), 36)
+        self.assertAlmostEqual(env.kmh_to_ms(36), 10)
+        self.assertAlmostEqual(env.mph_to_kmh(10), 16.09344)
+        self.assertAlmostEqual(env.kmh_to_mph(16.09344), 10)
+        self.assertAlmostEqual(env.mps_to_kmh(1), 5793.6384)
+        self.assertAlmostEqual(env.kmh_to_mps(5793.6384), 1)
+
+    def test_speed_invalid(self):
+        self.assertTrue(math.isnan(env.ms_to_kmh('10')))
+        self.assertTrue(math.isnan(env.kmh_to_kn(None)))
+
+    def test_distance(self):
+        self.assertAlmostEqual(env.miles_to_meter(1), 1609.344)
+        self.assertAlmostEqual(env.nauticalmiles_to_meter(2), 3704)
+        self.assertAlmostEqual(env.meter_to_miles(1609.344), 1)
+        self.assertAlmostEqual(env.meter_to_nauticalmiles(3704), 2)
+
+    def test_ms_to_bft(self):
+        self.assertEqual(env.ms_to_bft(0), 0)
+        for bft, limit in enumerate(BFT_LIMITS):
+            self.assertEqual(env.ms_to_bft(limit), bft)
+            self.assertEqual(env.ms_to_bft(limit + 0.01), bft + 1)
+        self.assertEqual(env.ms_to_bft(100), 12)
+        self.assertEqual(env.ms_to_bft('5'), -1)
+
+    def test_kmh_to_bft(self):
+        self.assertEqual(env.kmh_to_bft(0), 0)
+        for bft, limit in enumerate(BFT_LIMITS):
+            self.assertEqual(env.kmh_to_bft(limit * 3.6), bft)
+            self.assertEqual(env.kmh_to_bft(limit * 3.6 + 0.01), bft + 1)
+        self.assertEqual(env.kmh_to_bft(400), 12)
+        self.assertEqual(env.kmh_to_bft('5'), -1)
+
+    def test_bft_nan(self):
+        self.assertEqual(env.ms_to_bft(math.nan), -1)
+        self.assertEqual(env.kmh_to_bft(math.nan), -1)
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_bft_array(self):
+        speeds = np.array([0, 0.3, 0.31, 5, 32.7, 32.71, 100, np.nan])
+        expected = [0, 0, 1, 3, 11, 12, 12, -1]
+        self.assertEqual(env.ms_to_bft_array(speeds).tolist(), expected)
+        self.assertEqual(env.ms_to_bft(speeds).tolist(), expected)
+        self.assertEqual(env.ms_to_bft_array(speeds).dtype, np.int8)
+
+        limits = np.array(BFT_LIMITS)
+        speeds = np.concatenate((limits, limits + 0.01, [np.nan]))
+        self.assertEqual(env.ms_to_bft(speeds).tolist(), [env.ms_to_bft(float(s)) for s in speeds])
+        speeds = speeds * 3.6
+        self.assertEqual(env.kmh_to_bft(speeds).tolist(), [env.kmh_to_bft(float(s)) for s in speeds])
+        self.assertEqual(env.kmh_to_bft_array(speeds).tolist(), [env.kmh_to_bft(float(s)) for s in speeds])
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_bft_array_invalid(self):
+        self.assertEqual(env.ms_to_bft(np.array(['a'])), -1)
+        self.assertEqual(env.ms_to_bft(np.array([1.0, None])), -1)
+        self.assertEqual(env.kmh_to_bft(np.array(['a'])), -1)
+        self.assertEqual(env.kmh_to_bft(np.array([True])), -1)
+
+    def test_bft_to_text(self):
+        self.assertEqual(env.bft_to_text(0), 'Windstille')
+        self.assertEqual(env.bft_to_text(12), 'Orkan')
+        self.assertEqual(env.bft_to_text(5.5), 'frischer Wind')
+        self.assertEqual(env.bft_to_text(13), '')
+        self.assertEqual(env.bft_to_text(-1), '')
+        self.assertEqual(env.bft_to_text(math.nan), '')
+        self.assertEqual(env.bft_to_text('3'), '')
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_bft_to_text_array(self):
+        self.assertEqual(env.bft_to_text(np.array([1, 2])), '')
+
+    def test_degrees_to_direction(self):
+        self.assertEqual(env.degrees_to_direction_8(0), 'N')
+        self.assertEqual(env.degrees_to_direction_8(22.6), 'NO')
+        self.assertEqual(env.degrees_to_direction_8(90), 'O')
+        self.assertEqual(env.degrees_to_direction_8(359), 'N')
+        self.assertEqual(env.degrees_to_direction_8(-90), 'W')
+        self.assertEqual(env.degrees_to_direction_16(22.5), 'NNO')
+        self.assertEqual(env.degrees_to_direction_16(200), 'SSW')
+        self.assertEqual(env.degrees_to_direction_8(None), '?')
+        self.assertEqual(env.degrees_to_direction_8('N'), '')
+
+    def test_degrees_to_direction_nan(self):
+        self.assertEqual(env.degrees_to_direction_8(math.nan), '?')
+        self.assertEqual(env.degrees_to_direction_16(math.inf), '?')
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_degrees_to_direction_array(self):
+        degs = np.array([0, 22.4, 22.6, 90, 180, 269.9, 359, 360, -45, 725, np.nan, np.inf])
+        self.assertEqual(env.degrees_to_direction_8(degs).tolist(), [env.degrees_to_direction_8(float(d)) for d in degs])
+        self.assertEqual(env.degrees_to_direction_16(degs).tolist(), [env.degrees_to_direction_16(float(d)) for d in degs])
+        self.assertEqual(env.degrees_to_direction_8_array(np.array([np.nan, 90]))[0], '?')
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_degrees_to_direction_array_invalid(self):
+        self.assertEqual(env.degrees_to_direction_8(np.array(['N'])), '')
+        self.assertEqual(env.degrees_to_direction_16(np.array([90.0, None])), '')
+
+
+ADDRESS_RESPONSE = b'{"address": {"city": "Berlin", "suburb": "Mitte", "country": "Deutschland"}}'
+
+
+class FakeResponse:
+
+    def __init__(self, status_code=200, content=ADDRESS_RESPONSE):
+        self.status_code = status_code
+        self.content = content
+
+
+class FakeSession:
+    """
+    Replaces the requests session of lib.env, so the nominatim tests need no network access
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        response = self.responses.pop(0) if self.responses else FakeResponse()
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class LibEnvLocationTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        lib.translation.initialize_translations(common.BASE, 'de', 'en')
+
+    def setUp(self):
+        self.saved_session = env._session
+        env._location_cache.clear()
+
+    def tearDown(self):
+        env._session = self.saved_session
+        env._location_cache.clear()
+
+    @unittest.skipIf(requests is None, "requests is not installed")
+    def test_session(self):
+        env._session = None
+        session = env._get_session()
+        self.assertIs(env._get_session(), session)
+        self.assertEqual(session.headers['User-Agent'], 'SmartHomeNG/lib.env')
+        retry = session.get_adapter('https://nominatim.openstreetmap.org/reverse').max_retries
+        self.assertEqual(retry.total, 3)
+        self.assertEqual(retry.backoff_factor, 0.3)
+        self.assertEqual(list(retry.status_forcelist), [502, 503, 504])
+        session.close()
+
+    @unittest.skipIf(orjson is None, "orjson is not installed")
+    def test_json_parsers(self):
+        response = '{"address": {"city": "Köln", "suburb": "Altstadt-Nord", "postcode": "50667"}, "place_id": 1}'.encode()
+        json_loads = env._json_loads
+        results = []
+        try:
+            for env._json_loads in (orjson.loads, json.loads):
+                env._location_cache.clear()
+                env._session = FakeSession(FakeResponse(200, response))
+                results.append(env.location_address(50.94, 6.96))
+        finally:
+            env._json_loads = json_loads
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0]['city'], 'Köln')
+
+    def test_cache_hit(self):
+        env._session = FakeSession()
+        self.assertEqual(env.location_name(52.5, 13.4), 'Berlin, Mitte')
+        self.assertEqual(env.location_name('52.50001', 13.40004), 'Berlin, Mitte')
+        self.assertEqual(env.location_address(52.5, 13.4)['country'], 'Deutschland')
+        self.assertEqual(len(env._session.urls), 1)
+        self.assertEqual(list(env._location_cache), [(52.5, 13.4)])
+
+        self.assertEqual(env.location_name(52.5002, 13.4), 'Berlin, Mitte')
+        self.assertEqual(len(env._session.urls), 2)
+
+    def test_request_exception_not_cached(self):
+        env._session = FakeSession(ConnectionError('no route to host'), FakeResponse())
+        with self.assertLogs('lib.env', 'WARNING'):
+            self.assertEqual(env.location_name(7, 8), '')
+        self.assertEqual(env._location_cache, {})
+        self.assertEqual(env.location_name(7, 8), 'Berlin, Mitte')
+        self.assertEqual(len(env._session.urls), 2)
+
+    def test_invalid_json_not_cached(self):
+        env._session = FakeSession(FakeResponse(200, b'<html>'), FakeResponse())
+        with self.assertLogs('lib.env', 'WARNING'):
+            self.assertEqual(env.location_address(7, 8), '')
+        self.assertEqual(env._location_cache, {})
+        self.assertEqual(env.location_address(7, 8)['city'], 'Berlin')
+
+    def test_cache_eviction(self):
+        env._session = FakeSession()
+        cache_size = env._LOCATION_CACHE_SIZE
+        env._LOCATION_CACHE_SIZE = 3
+        try:
+            for lat in range(4):
+                env.location_name(lat, 0)
+        finally:
+            env._LOCATION_CACHE_SIZE = cache_size
+        self.assertEqual(list(env._location_cache), [(1, 0), (2, 0), (3, 0)])
+
+        env.location_name(0, 0)
+        self.assertEqual(len(env._session.urls), 5)
+
+    def test_location_address_copy(self):
+        env._session = FakeSession()
+        address = env.location_address(7, 8)
+        address['city'] = 'Hamburg'
+        self.assertEqual(env.location_address(7, 8)['city'], 'Berlin')
+        self.assertEqual(len(env._session.urls), 1)
+
+    def test_server_error(self):
+        env._session = FakeSession(FakeResponse(503, b'<html>Service Unavailable</html>'))
+        with self.assertLogs('lib.env', 'WARNING') as logs:
+            self.assertEqual(env.location_name(7, 8), '')
+        self.assertIn('503', logs.output[0])
+        self.assertEqual(len(env._session.urls), 1)
+        self.assertEqual(env._location_cache, {})
+
+    def test_http_error_not_cached(self):
+        env._session = FakeSession(FakeResponse(400, b'{"error": {"code": 400, "message": "Parameter lat out of range"}}'),
+                                   FakeResponse())
+        with self.assertLogs('lib.env', 'WARNING'):
+            self.assertEqual(env.location_address(7, 8), '')
+        self.assertEqual(env._location_cache, {})
+        self.assertEqual(env.location_address(7, 8)['city'], 'Berlin')
+        self.assertEqual(len(env._session.urls), 2)
+
+    def test_error_response_not_cached(self):
+        env._session = FakeSession(FakeResponse(200, b'{"error": "Unable to geocode"}'), FakeResponse())
+        with self.assertLogs('lib.env', 'WARNING'):
+            self.assertEqual(env.location_name(7, 8), '')
+        self.assertEqual(env._location_cache, {})
+        self.assertEqual(env.location_name(7, 8), 'Berlin, Mitte')
+        self.assertEqual(len(env._session.urls), 2)
+
+    def test_cache_threads(self):
+        env._session = FakeSession()
+        cache_size = env._LOCATION_CACHE_SIZE
+        env._LOCATION_CACHE_SIZE = 2
+        errors = []
+
+        def lookup(lat):
+            try:
+                for lon in range(50):
+                    if env.location_name(lat, lon) != 'Berlin, Mitte':
+                        errors.append((lat, lon))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=lookup, args=(lat,)) for lat in range(8)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            env._LOCATION_CACHE_SIZE = cache_size
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(env._location_cache), 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)